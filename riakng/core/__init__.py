@@ -17,34 +17,62 @@
 
 from __future__ import absolute_import
 
+import logging
+from importlib.util import find_spec
+
 from .exceptions import *
 
-try:
-    from .http import HTTPTransport
-except ImportError:
-    errormsg = "HTTPTransport is not available most likely due to the lack " + \
-               "of the requests module. Try import requests in your python " + \
-               "terminal."
-    print errormsg
-    from .transport import Transport
-    class HTTPTransport(Transport):
-        fake = True
-        def __init__(self, *arg, **kwargs):
-            raise RiakngError(errormsg)
+logger = logging.getLogger(__name__)
+
+# The transports are provided by __getattr__, which star imports only go
+# through for the names listed here.
+__all__ = ["RiakngError", "RequestError", "HTTPRequestError",
+           "PBCRequestError", "HTTPTransport", "PBCTransport"]
 
-try:
-    from .pbc import PBCTransport
-except ImportError:
-    errormsg = "PBCTransport is not available most likely due to the lack of "+\
-               "protobuf support or the protobuf messages are not compiled. " +\
-               "See README.md for this library for details."
-    print errormsg
+_HTTP_ERRORMSG = "HTTPTransport is not available most likely due to the " + \
+                 "lack of the requests module. Try import requests in your " + \
+                 "python terminal."
+_PBC_ERRORMSG = "PBCTransport is not available most likely due to the lack " + \
+                "of protobuf support or the protobuf messages are not " + \
+                "compiled. See README.md for this library for details."
+
+def _module_available(name):
+    try:
+        return find_spec(name) is not None
+    except ImportError: # The parent package is missing.
+        return False
+
+if not _module_available("requests") and \
+    not _module_available("google.protobuf"):
+    raise RiakngError("Both HTTP and PBC Transports are not available.")
+
+def _unavailable_transport(name, errormsg):
+    logger.warning(errormsg)
     from .transport import Transport
-    class PBCTransport(Transport):
+    class UnavailableTransport(Transport):
         fake = True
         def __init__(self, *arg, **kwargs):
             raise RiakngError(errormsg)
+    UnavailableTransport.__name__ = UnavailableTransport.__qualname__ = name
+    return UnavailableTransport
 
-if getattr(HTTPTransport, "fake", False) and \
-    getattr(PBCTransport, "fake", False):
-    raise RiakngError("Both HTTP and PBC Transports are not available.")
+def __getattr__(name):
+    # The transports are only imported when they are first used, so a PBC only
+    # user never pays for importing requests and vice versa.
+    if name == "HTTPTransport":
+        try:
+            from .http import HTTPTransport as transport
+        except ImportError:
+            transport = _unavailable_transport(name, _HTTP_ERRORMSG)
+    elif name == "PBCTransport":
+        try:
+            from .pbc import PBCTransport as transport
+        except ImportError:
+            transport = _unavailable_transport(name, _PBC_ERRORMSG)
+    else:
+        raise AttributeError("module {0!r} has no attribute {1!r}".format(
+            __name__, name
+        ))
+
+    globals()[name] = transport
+    return transport
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+# cython: language_level=3, boundscheck=False, wraparound=False
+# Copyright 2012 Shuhao Wu <shuhao@shuhaowu.com>
+#
+# This file is provided to you under the Apache License,
+# Version 2.0 (the "License"); you may not use this file
+# except in compliance with the License.  You may obtain
+# a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Compiled version of http._split_multipart, used for link walking. It has to
+give exactly the same result as the python version, which is what gets used
+if this module is not built.
+"""
+
+from libc.string cimport memchr, memcmp
+from cpython.bytes cimport PyBytes_AS_STRING, PyBytes_FromStringAndSize
+
+cdef enum:
+    TAB = 9
+    LF = 10
+    CR = 13
+    SPACE = 32
+    COLON = 58
+
+cdef inline bint _isspace(unsigned char c):
+    # Same set of characters as bytes.strip()
+    return c == SPACE or TAB <= c <= CR
+
+cdef Py_ssize_t _find(const unsigned char *buf, Py_ssize_t start,
+                      Py_ssize_t end, const unsigned char *needle,
+                      Py_ssize_t n):
+    cdef const unsigned char *p
+    while end - start >= n:
+        p = <const unsigned char *>memchr(buf + start, needle[0],
+                                          end - start - n + 1)
+        if p == NULL:
+            return -1
+        if memcmp(p, needle, n) == 0:
+            return p - buf
+        start = p - buf + 1
+    return -1
+
+cdef dict _parse_headers(const unsigned char *buf, Py_ssize_t start,
+                         Py_ssize_t end):
+    cdef dict headers = {}
+    cdef const char *cbuf = <const char *>buf
+    cdef const unsigned char *p
+    cdef Py_ssize_t line_end, colon, vstart, vend
+
+    while start < end:
+        p = <const unsigned char *>memchr(buf + start, LF, end - start)
+        line_end = end if p == NULL else p - buf
+
+        colon = start
+        while colon < line_end and buf[colon] != COLON and buf[colon] != CR:
+            colon += 1
+
+        if colon > start and colon < line_end and buf[colon] == COLON:
+            vstart = colon + 1
+            while vstart < line_end and (buf[vstart] == SPACE or
+                                         buf[vstart] == TAB):
+                vstart += 1
+
+            vend = vstart
+            while vend < line_end and buf[vend] != CR:
+                vend += 1
+
+            # Only a trailing CR is allowed, a line with a CR in the middle is
+            # not a header.
+            if vend == line_end or vend + 1 == line_end:
+                while vend > vstart and (buf[vend - 1] == SPACE or
+                                         buf[vend - 1] == TAB):
+                    vend -= 1
+                headers[cbuf[start:colon].decode("latin-1").lower()] = \
+                    cbuf[vstart:vend].decode("latin-1")
+
+        start = line_end + 1
+
+    return headers
+
+def split_multipart(bytes content, str boundary):
+    """Splits a multipart body into a list of (headers, body) tuples. Header
+    names are lower cased.
+    """
+    cdef bytes sep = ("--" + boundary).encode("ascii")
+    cdef const unsigned char *buf = <const unsigned char *>PyBytes_AS_STRING(content)
+    cdef const unsigned char *sepbuf = <const unsigned char *>PyBytes_AS_STRING(sep)
+    cdef const unsigned char *blank = <const unsigned char *>b"\r\n\r\n"
+    cdef Py_ssize_t n = len(content), seplen = len(sep)
+    cdef Py_ssize_t start, end, a, b, headers_end
+    cdef list parts = []
+
+    # The preamble before the first separator is not a part.
+    start = _find(buf, 0, n, sepbuf, seplen)
+    if start == -1:
+        return parts
+    start += seplen
+
+    # Neither is whatever comes after the last one.
+    while True:
+        end = _find(buf, start, n, sepbuf, seplen)
+        if end == -1:
+            break
+
+        a, b = start, end
+        while a < b and _isspace(buf[a]):
+            a += 1
+        while b > a and _isspace(buf[b - 1]):
+            b -= 1
+
+        headers_end = _find(buf, a, b, blank, 4)
+        if headers_end == -1:
+            parts.append((_parse_headers(buf, a, b), b""))
+        else:
+            parts.append((
+                _parse_headers(buf, a, headers_end),
+                PyBytes_FromStringAndSize(<const char *>buf + headers_end + 4,
+                                          b - headers_end - 4)
+            ))
+
+        start = end + seplen
+
+    return parts
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+# cython: language_level=3
+# Copyright 2012 Shuhao Wu <shuhao@shuhaowu.com>
+#
+# This file is provided to you under the Apache License,
+# Version 2.0 (the "License"); you may not use this file
+# except in compliance with the License.  You may obtain
+# a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Compiled version of PBCTransport.recv_packet. The reads are done directly on
+the file descriptor without holding the GIL, so it only works on blocking
+sockets (the ones without a timeout). PBCTransport falls back to the python
+version for every other socket, or if this module is not built.
+"""
+
+from libc.errno cimport errno, EINTR
+from libc.string cimport strerror
+from cpython.bytes cimport PyBytes_AS_STRING, PyBytes_FromStringAndSize
+from cpython.exc cimport PyErr_CheckSignals
+
+cdef extern from "sys/socket.h" nogil:
+    ssize_t recv(int sockfd, void *buf, size_t length, int flags)
+
+cdef int _recv_exact(int fd, char *buf, Py_ssize_t n) except -1:
+    cdef Py_ssize_t offset = 0
+    cdef ssize_t received
+    cdef int err
+
+    while offset < n:
+        with nogil:
+            received = recv(fd, buf + offset, n - offset, 0)
+        if received > 0:
+            offset += received
+        elif received == 0:
+            raise EOFError(
+                "Connection closed after {0} of {1} bytes".format(offset, n)
+            )
+        else:
+            err = errno
+            if err == EINTR:
+                PyErr_CheckSignals()
+                continue
+            raise OSError(err, strerror(err).decode("utf-8", "replace"))
+
+    return 0
+
+def recv_packet(int fd):
+    """Reads one packet from a blocking socket's file descriptor.
+
+    :rtype: A (code, payload) tuple, with the payload in bytes.
+    """
+    cdef unsigned char header[5]
+    cdef int length
+    cdef bytes payload
+
+    _recv_exact(fd, <char *>header, 5)
+    length = <int>((<unsigned int>header[0] << 24) |
+                   (<unsigned int>header[1] << 16) |
+                   (<unsigned int>header[2] << 8) |
+                   <unsigned int>header[3])
+    if length < 1:
+        raise ValueError("Invalid packet length: {0}".format(length))
+
+    # The bytes object is filled in place before anything else can see it.
+    payload = PyBytes_FromStringAndSize(NULL, length - 1)
+    _recv_exact(fd, PyBytes_AS_STRING(payload), length - 1)
+    return header[4], payload
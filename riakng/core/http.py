@@ -16,33 +16,205 @@
 # under the License.
 from __future__ import absolute_import
 
+import codecs
 import re
-from urllib import quote_plus
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+try:
+    from urllib.parse import quote_plus, unquote_plus
+except ImportError: # python 2
+    from urllib import quote_plus, unquote_plus
 import json
 
 # If this is unavailable, this module will not be available.
 import requests
+from requests.adapters import HTTPAdapter
+from requests.utils import get_encoding_from_headers
 
-from .transport import Transport
+from .transport import Transport, _IDX_SUFFIXES
+from .result import GetResult, PutResult
 from .exceptions import HTTPRequestError, RiakngError
 
-_links_regex = re.compile("</([^/]+)/([^/]+)/([^/]+)>; ?riaktag=\"([^\']+)\"")
+# Bucket names come from a small set, so their quoted form is cached. Keys are
+# too varied for that and are quoted every time.
+_quote_bucket = lru_cache(maxsize=1024)(quote_plus)
+
+_links_regex = re.compile(r'</([^/]+)/([^/]+)/([^/]+)>;\s?riaktag="([^"]+)"',
+                          re.IGNORECASE)
 def _parse_links(linkstext):
     if not linkstext:
         return []
-    links = []
-    for link in linkstext.strip().split(","):
-        matches = _links_regex.match(link.strip())
-        if matches is not None:
-            # the regex magic forms 4 groups: ("riak", bucket, key, tag)
-            # RiakLink is a 3-tuple: (bucket, key, tag)
-            links.append((matches.group(2), matches.group(3), matches.group(4)))
-    return links
-
-# O.o who designed this format? Seems like me circa grade 10
-# The end ", " will are to connect them together, if you don't like it, [:-2].
-# BUG: (???) What happens if they bucket or key has commas in them?
-_riak_link_format = "</riak/{bucket}/{key}>; riaktag=\"{tag}\", "
+    # the regex magic forms 4 groups: ("riak", bucket, key, tag)
+    # RiakLink is a 3-tuple: (bucket, key, tag)
+    # bucket and key are escaped by riak (and by us in put).
+    return [(unquote_plus(m.group(2)), unquote_plus(m.group(3)), m.group(4))
+            for m in _links_regex.finditer(linkstext)]
+
+_boundary_regex = re.compile("multipart/mixed; boundary=([a-zA-Z0-9]+)")
+
+# requests merges this into a new dict for every request, so it can be shared.
+_json_headers = {"Content-Type": "application/json"}
+
+# One "Name: value" header per line of a multipart part.
+_header_regex = re.compile(r"^([^:\r\n]+):[ \t]*([^\r\n]*?)[ \t]*\r?$", re.M)
+
+def _split_multipart(content, boundary):
+    """Splits a multipart body into a list of (headers, body) tuples. Header
+    names are lower cased. A compiled version of this lives in _multipart.pyx.
+    """
+    parts = []
+
+    # Splitting on the separator gives the preamble, every part, and the
+    # closing "--" after the last separator. Only the parts are wanted.
+    # The body is bytes; the part headers are decoded like any HTTP header.
+    sep = ("--" + boundary).encode("ascii")
+    for part in content.strip().split(sep)[1:-1]:
+        headers, _, body = part.strip().partition(b"\r\n\r\n")
+        headers = {m.group(1).lower(): m.group(2)
+                   for m in _header_regex.finditer(headers.decode("latin-1"))}
+        parts.append((headers, body))
+
+    return parts
+
+try:
+    from ._multipart import split_multipart as _split_multipart
+except ImportError: # The extension is optional, see README.md
+    pass
+
+def _decode_body(headers, content):
+    # Riak values are opaque bytes, so only text bodies get decoded. This
+    # skips the unicode decode (and the charset guessing done by
+    # response.text) for everything else.
+    content_type = headers.get("content-type") or ""
+    if content_type.startswith("text/"):
+        return content.decode(get_encoding_from_headers(headers), "replace")
+    return content
+
+def _parse_meta_and_indexes(headers):
+    meta = {}
+    indexes = {}
+    meta_set = meta.__setitem__
+    index_set = indexes.__setitem__
+    for header_key, header_value in headers.items():
+        # Header names are case insensitive, so fold them before looking
+        # at the 12 character prefix.
+        header_key = header_key.lower()
+        prefix = header_key[:12]
+        if prefix == "x-riak-meta-":
+            meta_set(header_key[12:], header_value)
+        elif prefix == "x-riak-index":
+            # TODO: Fix issue with splitting index values with ,
+            # Note that this is a riak bug... currently no one is taking
+            # a look at it, though.
+            i = header_value.split(", ")
+            if header_key.endswith("_int"):
+                i = [int(x) for x in i]
+            index_set(header_key[13:], i)
+    return meta, indexes
+
+_decode_json_value = json.JSONDecoder().raw_decode
+
+def _iter_index_keys(response):
+    """Yields the keys of a streamed {"keys": [...]} 2i response as they
+    arrive, without holding the whole response in memory. The response is
+    closed at the end, or when the generator is.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    buf = ""
+    pos = -1 # Not in the list yet
+    try:
+        for chunk in response.iter_content(8192):
+            buf += decoder.decode(chunk)
+            if pos == -1:
+                pos = buf.find("[")
+                if pos == -1:
+                    continue
+                pos += 1
+
+            while True:
+                while pos < len(buf) and buf[pos] in " \t\r\n,":
+                    pos += 1
+                if pos == len(buf) or buf[pos] == "]":
+                    break
+                try:
+                    key, pos = _decode_json_value(buf, pos)
+                except ValueError: # Cut off by the end of the chunk
+                    break
+                yield key
+
+            buf = buf[pos:]
+            pos = 0
+
+        if pos == -1 or not buf.startswith("]"):
+            raise RiakngError("Malformed index response: {0!r}".format(buf))
+    finally:
+        response.close()
+
+class LazyRiakObject(object):
+    """A riak object from a HTTP response that only parses the data, links,
+    meta and indexes when they are first accessed. It can be indexed just like
+    the riak object dictionary described in Transport's docstring.
+    """
+    __slots__ = ("headers", "_content", "_parsed")
+
+    _HEADER_FIELDS = {
+        "vclock": "x-riak-vclock",
+        "content-type": "content-type",
+        "vtag": "etag",
+        "last-modified": "last-modified",
+    }
+
+    def __init__(self, headers, content):
+        self.headers = headers
+        self._content = content
+        self._parsed = {}
+
+    @property
+    def data(self):
+        if "data" not in self._parsed:
+            self._parsed["data"] = _decode_body(self.headers, self._content)
+        return self._parsed["data"]
+
+    @property
+    def links(self):
+        # Only needs the link header, not a walk through all of them.
+        if "links" not in self._parsed:
+            self._parsed["links"] = _parse_links(self.headers.get("link"))
+        return self._parsed["links"]
+
+    @property
+    def meta(self):
+        if "meta" not in self._parsed:
+            self._parse_meta_and_indexes()
+        return self._parsed["meta"]
+
+    @property
+    def indexes(self):
+        if "indexes" not in self._parsed:
+            self._parse_meta_and_indexes()
+        return self._parsed["indexes"]
+
+    def _parse_meta_and_indexes(self):
+        # Both live in the same headers, so they are parsed in one go.
+        meta, indexes = _parse_meta_and_indexes(self.headers)
+        self._parsed["meta"] = meta
+        self._parsed["indexes"] = indexes
+
+    def __getitem__(self, key):
+        if key in ("data", "links", "meta", "indexes"):
+            return getattr(self, key)
+        return self.headers.get(self._HEADER_FIELDS[key])
+
+    def __contains__(self, key):
+        return key in ("data", "links", "meta", "indexes") or \
+               key in self._HEADER_FIELDS
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
 
 class HTTPTransport(Transport):
     """Transport for HTTP. This class uses the requests module to make all the
@@ -56,38 +228,47 @@ class HTTPTransport(Transport):
         self._port = str(port)
         self._schema = schema
         self._url_prefix = self._schema + "://" + self._host + ":" + self._port
+        self._riak_prefix = self._url_prefix + "/riak/"
+        self._bucket_prefix = self._url_prefix + "/buckets/"
+
+        # These never change for a transport, so they are only built once.
+        self._ping_url = self._url_prefix + "/ping"
+        self._mapred_url = self._url_prefix + "/mapred"
+        self._stats_url = self._url_prefix + "/stats"
+        self._list_buckets_url = self._url_prefix + "/riak"
+
+        # A single session keeps the connections to riak alive between
+        # requests instead of doing a new TCP (and TLS) handshake every time.
+        self._session = requests.Session()
+        self._session.mount(self._url_prefix, HTTPAdapter(pool_connections=10,
+                                                          pool_maxsize=50,
+                                                          max_retries=0))
+        self._session.headers["X-Riak-ClientId"] = self._client_id
+
+        self._bucket_props_cache = {}
+        self._bucket_props_lock = threading.Lock()
+
+    def close(self):
+        self._session.close()
 
     def ping(self):
-        response = requests.get(self._url_prefix + "/ping")
+        response = self._session.get(self._ping_url)
         return response.status_code == 200
 
     def _parse_object(self, headers, content):
         r = {}
-        r["data"] = content
+        r["data"] = _decode_body(headers, content)
         r["vclock"] = headers["x-riak-vclock"]
         r["content-type"] = headers.get("content-type")
         r["links"] = _parse_links(headers["link"])
         r["vtag"] = headers.get("etag")
         r["last-modified"] = headers.get("last-modified")
-        r["meta"] = meta = {}
-        r["indexes"] = indexes = {}
-        for header_key, header_value in headers.iteritems():
-            if header_key.startswith("x-riak-meta-"):
-                meta[header_key[12:]] = header_value
-            elif header_key.startswith("x-riak-index"):
-                # TODO: Fix issue with splitting index values with ,
-                # Note that this is a riak bug... currently no one is taking
-                # a look at it, though.
-                i = header_value.split(", ")
-                if header_key.endswith("_int"):
-                    i = list(map(int, i)) # list is for py3k compat
-                indexes[header_key[13:]] = i
+        r["meta"], r["indexes"] = _parse_meta_and_indexes(headers)
         return r
 
     def _parse_siblings(self, content):
-        siblings = content.strip().split("\n")
-        r = {"siblings": siblings[1:]}
-        return r
+        # The first line is "Siblings:", the vtags follow one per line.
+        return content.strip().split("\n")[1:]
 
     def _assert_response_code(self, response, expected):
         if response.status_code not in expected:
@@ -96,36 +277,87 @@ class HTTPTransport(Transport):
                                    response.status_code)
 
     __GET_STATUS = {200: "ok", 300: "multiple_choice", 304: "not_modified"}
-    def get(self, bucket, key, r=None, vclock=None, headers=None, **params):
+    def get(self, bucket, key, r=None, vclock=None, headers=None, lazy=False,
+            **params):
+        """Same as the Transport's get, with one extra argument:
+
+        :param lazy: If True, the sibling is a LazyRiakObject which only
+                     parses its data, links, meta and indexes when they are
+                     accessed. Useful when only part of the object is needed.
+        :type lazy: boolean
+        """
         # TODO: implement get all siblings in one request
         # Check http://docs.basho.com/riak/latest/references/apis/http/HTTP-Fetch-Object/
-        if headers is None: headers = {}
-        url = "/riak/{bucket}/{key}".format(bucket=quote_plus(bucket),
-                                            key=quote_plus(key))
+        url = self._riak_prefix + _quote_bucket(bucket) + "/" + quote_plus(key)
 
         params.update({"r" : r, "vclock" : vclock})
-        response = requests.get(self._url_prefix + url, params=params,
-                                headers=headers)
+        response = self._session.get(url, params=params, headers=headers)
 
         self._assert_response_code(response, self.__GET_STATUS)
 
-        r = {
-            "headers" : response.headers,
-            "status" : self.__GET_STATUS[response.status_code]
-            }
-
         if response.status_code == 200:
-            r["siblings"] = [self._parse_object(response.headers, response.text)]
+            if lazy:
+                siblings = [LazyRiakObject(response.headers, response.content)]
+            else:
+                siblings = [self._parse_object(response.headers,
+                                               response.content)]
         elif response.status_code == 300:
-            if headers.get("Accept") == "multipart/mixed":
+            if headers and headers.get("Accept") == "multipart/mixed":
                 # TODO: Get rid of this. Consult:
                 # http://docs.basho.com/riak/latest/references/apis/http/HTTP-Fetch-Object/
                 raise NotImplementedError("lolwut. I don't know how to handle this yet")
-            r.update(self._parse_siblings(response.text))
+            siblings = self._parse_siblings(response.text)
         else:
-            r["siblings"] = [] # No content for 304 not modified
-
-        return r
+            siblings = [] # No content for 304 not modified
+
+        return GetResult(headers=response.headers,
+                         status=self.__GET_STATUS[response.status_code],
+                         siblings=siblings)
+
+    def get_siblings(self, bucket, key, vtags, max_workers=8):
+        """Fetches siblings of an object concurrently, over the pooled
+        connections of this transport.
+
+        :param bucket: The bucket name
+        :param key: The key name
+        :param vtags: The vtags of the siblings to fetch, as returned in
+                      "siblings" by a get with the "multiple_choice" status.
+        :param max_workers: The maximum number of requests in flight.
+        :rtype: A list of riak objects, in the same order as vtags.
+        """
+        url = self._riak_prefix + _quote_bucket(bucket) + "/" + quote_plus(key)
+
+        def fetch(vtag):
+            response = self._session.get(url, params={"vtag": vtag})
+            self._assert_response_code(response, (200, ))
+            return self._parse_object(response.headers, response.content)
+
+        return self._fan_out(fetch, vtags, max_workers)
+
+    def _fan_out(self, fn, args, max_workers):
+        # Runs fn over args on a few threads, which share the session's
+        # connection pool. Results are in the order of args.
+        args = list(args)
+        if not args:
+            return []
+
+        with ThreadPoolExecutor(max_workers=min(max_workers,
+                                                len(args))) as executor:
+            return list(executor.map(fn, args))
+
+    def multi_get(self, bucket_keys, max_workers=8, **params):
+        """Same as the Transport's multi_get. The gets are sent concurrently,
+        at most max_workers at a time.
+        """
+        return self._fan_out(lambda bk: self.get(bk[0], bk[1], **params),
+                             bucket_keys, max_workers)
+
+    def multi_put(self, items, max_workers=8, **params):
+        """Same as the Transport's multi_put. The puts are sent concurrently,
+        at most max_workers at a time.
+        """
+        return self._fan_out(lambda item: self.put(*item, **params), items,
+                             max_workers)
 
     __PUT_STATUS = {
             201: "created",
@@ -136,8 +368,9 @@ class HTTPTransport(Transport):
     def put(self, bucket, key, content, content_type, meta=None, indexes=None,
             links=None, w=None, vclock=None, headers=None, **params):
 
-        if headers is None:
-            headers = {}
+        # Only the headers of this request are sent along, the client id and
+        # the other defaults are on the session already.
+        headers = dict(headers) if headers else {}
 
         if key is None:
             key = ""
@@ -145,31 +378,31 @@ class HTTPTransport(Transport):
         headers["Content-Type"] = content_type
 
         if meta:
-            for header, value in meta.iteritems():
-                headers["X-Riak-Meta-{0}".format(header)] = value
+            # requests only takes str values, numbers have to be converted.
+            for header, value in meta.items():
+                if not isinstance(value, str):
+                    value = str(value)
+                headers["X-Riak-Meta-" + header] = value
 
         if indexes:
-            index_headers = {}
+            # Values of the same field go in one comma separated header.
+            grouped = {}
             for field_key, field_value in indexes:
-                values = index_headers.setdefault(
-                    "X-Riak-Index-{0}".format(field_key),
-                    [],
-                )
-                values.append(str(field_value))
-            for field_key, values in index_headers.iteritems():
-                index_headers[field_key] = ", ".join(values)
+                if not isinstance(field_value, str):
+                    field_value = str(field_value)
+                grouped.setdefault(field_key, []).append(field_value)
 
-            headers.update(index_headers)
+            for field_key, values in grouped.items():
+                headers["X-Riak-Index-" + field_key] = ", ".join(values)
 
         if links:
-            headers["Link"] = ""
-            for link_bucket, link_key, tag in links:
-                headers["Link"] += _riak_link_format.format(bucket=link_bucket,
-                                                            key=link_key,
-                                                            tag=tag)
-
-            # This gets rid of the final ,<space>
-            headers["Link"] = headers["Link"][:-2]
+            # bucket and key are escaped so commas in them cannot break the
+            # header apart.
+            headers["Link"] = ", ".join([
+                "</riak/%s/%s>; riaktag=\"%s\"" % (_quote_bucket(link_bucket),
+                                                   quote_plus(link_key), tag)
+                for link_bucket, link_key, tag in links
+            ])
 
         if vclock:
             headers["X-Riak-Vclock"] = vclock
@@ -178,184 +411,189 @@ class HTTPTransport(Transport):
         if params.get("returnbody", False):
             params["returnbody"] = "true"
 
-        url = "/riak/{bucket}"
+        url = self._riak_prefix + _quote_bucket(bucket)
         if key:
-            url += "/{key}"
-
-        url = url.format(bucket=quote_plus(bucket), key=quote_plus(key))
+            url += "/" + quote_plus(key)
 
         if not key:
-            response = requests.post(self._url_prefix + url, content,
-                                    params=params, headers=headers)
+            response = self._session.post(url, content, params=params,
+                                          headers=headers)
         else:
-            response = requests.put(self._url_prefix + url, content,
-                                   params=params, headers=headers)
+            response = self._session.put(url, content, params=params,
+                                         headers=headers)
 
         self._assert_response_code(response, self.__PUT_STATUS)
 
-        r = {
-            "headers": response.headers,
-            "status": self.__PUT_STATUS[response.status_code]
-        }
+        r = PutResult(headers=response.headers,
+                      status=self.__PUT_STATUS[response.status_code])
 
         location = response.headers["location"]
         if location:
             # the string after the last slash is the key in http api
-            r["key"] = location[location.rindex("/")+1:]
+            r.key = location[location.rindex("/")+1:]
         else:
             if key is None:
                 raise RiakngError("Server didn't respond with a key. Check riak for bugs..")
-            r["key"] = key
+            r.key = key
 
         if response.status_code == 300:
             # TODO: I don't know how to trigger this, but I assume siblings
             #       happens here. Can't be sure. Confirm please.
-            r.update(self._parse_siblings(response.text))
+            r.siblings = self._parse_siblings(response.text)
         elif response.status_code in (200, 201) and \
                 params.get("returnbody", False):
-            r["siblings"] = [self._parse_object(response.headers, response.text)]
+            r.siblings = [self._parse_object(response.headers,
+                                             response.content)]
         # 204 is the other case, but since there's no content?
         return r
 
     def delete(self, bucket, key, **params):
-        url = "/riak/{bucket}/{key}".format(bucket=quote_plus(bucket),
-                                            key=quote_plus(key))
+        url = self._riak_prefix + _quote_bucket(bucket) + "/" + quote_plus(key)
 
-        response = requests.delete(self._url_prefix + url, params=params)
+        response = self._session.delete(url, params=params)
         self._assert_response_code(response, (204, 404))
         return True
 
-    def index(self, bucket, field, start, end=None):
-        url = "/buckets/{bucket}/index/{field}/{start}"
-        if end:
-            url += "/{end}"
-            url = url.format(bucket=bucket, field=field, start=start, end=end)
-        else:
-            url = url.format(bucket=bucket, field=field, start=start)
+    def multi_delete(self, bucket_keys, max_workers=32, **params):
+        """Same as the Transport's multi_delete. The deletes are sent
+        concurrently, at most max_workers at a time.
+        """
+        return self._fan_out(lambda bk: self.delete(bk[0], bk[1], **params),
+                             bucket_keys, max_workers)
 
-        if len(field) <= 4 or field[-3:] not in ("bin", "int"):
+    def index(self, bucket, field, start, end=None, collect=True):
+        # A field needs at least one character in front of the suffix.
+        if len(field) < 5 or field[-4:] not in _IDX_SUFFIXES:
             raise RiakngError("2i fields must end with either _bin or _int.")
-        response = requests.get(self._url_prefix + url)
-        self._assert_response_code(response, (200, ))
-        return response.json()["keys"]
-
-    BOUNDARY_REGEX = re.compile("multipart/mixed; boundary=([a-zA-Z0-9]+)")
-    def _parse_linked_object_part(self, boundary, content):
-        # first we need to parse through each item in the list.
-        parts = []
-        startsep = "--" + boundary
-        seplen = len(startsep)
-        content = content.strip()
-        start = 0
-
-        # Use loop to find each section separated by the boundaries
-        while True:
-            # Find the starting separator, and then set the start spot to be
-            # immediately after it
-            start = content.find(startsep, start) + seplen
-
-            # Find the ending separator, between the start and the end is the
-            # a part of the multipart response
-            end = content.find(startsep, start)
-
-            # This means that either start was not found or end was not found.
-            # Note that "".find("a", 1000) == -1 as start > length
-            if start == -1 or end == -1:
-                break
-
-            # Now that we got the part, we parse it for headers and content
-            part = content[start:end].strip()
-            headers, sep, c = part.partition("\r\n\r\n")
-            h = {}
-
-            # Parse through the headers
-            for line in headers.strip().split("\r\n"):
-                k, sep, v = line.partition(": ")
-                h[k.lower()] = v.strip()
 
+        url = "%s%s/index/%s/%s" % (self._bucket_prefix, bucket, field, start)
+        if end is not None:
+            url += "/%s" % end
+
+        if collect:
+            response = self._session.get(url)
+            self._assert_response_code(response, (200, ))
+            return response.json()["keys"]
+
+        # The request is sent right away so errors are raised here, not on
+        # the first next().
+        response = self._session.get(url, stream=True)
+        try:
+            self._assert_response_code(response, (200, ))
+        except HTTPRequestError:
+            response.close()
+            raise
+        return _iter_index_keys(response)
+
+    BOUNDARY_REGEX = _boundary_regex
+    def _extract_boundary(self, content_type):
+        # Riak always sends "multipart/mixed; boundary=XYZ", which partition
+        # handles without going through the regex engine. Anything that does
+        # not look like that falls back to the regex.
+        boundary = content_type.partition("boundary=")[2].strip().strip('"')
+        if boundary.isalnum():
+            return boundary
+
+        boundary = _boundary_regex.match(content_type)
+        return boundary.group(1) if boundary else None
+
+    def _iter_linked_object_part(self, boundary, content):
+        # Yields the parsed parts one at a time so the caller can stop early
+        # without the whole response being turned into objects first.
+        parse_object = self._parse_object
+        iter_part = self._iter_linked_object_part
+
+        for h, c in _split_multipart(content, boundary):
             # This is if there is a link phase, Riak returns with 1 header of
             # Content-Type and has the content as that phase. So we need to
             # recursively call this function
-            if len(h) == 1 and "multipart/mixed" in h.values()[0]:
-                cbound = self.BOUNDARY_REGEX.match(h["content-type"])
+            if len(h) == 1 and \
+                    "multipart/mixed" in h.get("content-type", ""):
+                cbound = self._extract_boundary(h["content-type"])
                 if not cbound: # Can't think of a scenario where this happens
                     raise RiakngError(
-                        "There's a bug in riak or this client: {0}".format(part)
+                        "There's a bug in riak or this client: {0}".format(h)
                     )
-                cbound = cbound.group(1)
-                parts.append(self._parse_linked_object_part(cbound, c))
+                yield list(iter_part(cbound, c))
             else:
                 # TODO: is it possible for this to be siblinggs and we have to
                 # parse through the siblings?
-                response = self._parse_object(h, c)
+                response = parse_object(h, c)
                 location = h.get("location")
                 # I don't see why this will ever be False.. but I'm too scared
                 # to remove it.
                 if location:
                     response["key"] = location[location.rindex("/")+1:]
-                parts.append(response)
-
-        return parts
+                yield response
 
     def walk_link(self, bucket, key, link_phases):
-        url = "/riak/{bucket}/{key}".format(bucket=bucket, key=key)
+        return list(self.iter_walk_link(bucket, key, link_phases))
+
+    def iter_walk_link(self, bucket, key, link_phases):
+        """Same as walk_link, except that an iterator over the results of
+        the link phases is returned instead of a list.
+        """
+        url = self._riak_prefix + bucket + "/" + key
         for b, tag, keep in link_phases:
-            url += "/{bucket},{tag},{keep}".format(bucket=b, tag=tag,
-                                                   keep=str(int(keep)))
+            url += "/%s,%s,%d" % (b, tag, keep)
 
-        response = requests.get(self._url_prefix + url)
+        response = self._session.get(url)
         self._assert_response_code(response, (200, ))
-        boundary = self.BOUNDARY_REGEX.match(response.headers["content-type"])
+        boundary = self._extract_boundary(response.headers["content-type"])
         if not boundary: # again, same thing. This is a bug if it happens..
             raise RiakngError(
                 "There's a bug in riak or this client: {0}".format(
                     response.headers
                 )
             )
-        boundary = boundary.group(1)
-        return self._parse_linked_object_part(boundary, response.content)
+        return self._iter_linked_object_part(boundary, response.content)
 
     def mapreduce(self, inputs, query, timeout=None):
-        headers = {"Content-Type": "application/json"}
         content = {"inputs" : inputs, "query" : query}
         if timeout:
             content["timeout"] = timeout
-        response = requests.post(self._url_prefix + "/mapred",
-                                 json.dumps(content),
-                                 headers=headers)
+        response = self._session.post(self._mapred_url, json.dumps(content),
+                                      headers=_json_headers)
         self._assert_response_code(response, (200, ))
 
         return response.json()
 
     def get_keys(self, bucket):
         params = {"keys" : "true", "props": "false"}
-        url = "/riak/{bucket}".format(bucket=bucket)
-        response = requests.get(self._url_prefix + url, params=params)
+        response = self._session.get(self._riak_prefix + bucket, params=params)
         self._assert_response_code(response, (200,))
         return response.json()["keys"]
 
     def get_buckets(self):
         params = {"buckets" : "true"}
-        response = requests.get(self._url_prefix + "/riak", params=params)
+        response = self._session.get(self._list_buckets_url, params=params)
         self._assert_response_code(response, (200, ))
         return response.json()["buckets"]
 
     def get_bucket_properties(self, bucket):
+        properties = self._cached_bucket_properties(bucket)
+        if properties is not None:
+            return properties
+
         params = {"keys" : "false", "props" : "true"}
-        url = "/riak/{bucket}".format(bucket=bucket)
-        response = requests.get(self._url_prefix + url, params=params)
+        response = self._session.get(self._riak_prefix + bucket, params=params)
         self._assert_response_code(response, (200, ))
-        return response.json()["props"]
+        properties = response.json()["props"]
+        self._cache_bucket_properties(bucket, properties)
+        return properties
 
     def set_bucket_properties(self, bucket, properties):
         content = {"props" : properties}
-        url = "/riak/{bucket}".format(bucket=bucket)
-        response = requests.put(self._url_prefix + url, json.dumps(content))
+        response = self._session.put(self._riak_prefix + bucket,
+                                     json.dumps(content),
+                                     headers=_json_headers)
+        # Even a failed request could have changed something.
+        self._invalidate_bucket_properties(bucket)
         self._assert_response_code(response, (200, ))
         return True
 
     def stats(self):
-        response = requests.get(self._url_prefix + "/stats")
+        response = self._session.get(self._stats_url)
         self._assert_response_code(response, (200, ))
         return response.json()
 
@@ -20,14 +20,64 @@
 from __future__ import absolute_import
 
 import errno
+import logging
+import os
 import socket
 import struct
+import time
 import json
+from importlib.util import find_spec
 
+import google.protobuf
+
+logger = logging.getLogger(__name__)
+
+# Parsing and serializing is most of the work for every request, and the pure
+# python protobuf is an order of magnitude slower at it than the C++ one.
+# protobuf 4+ already defaults to the upb backend (which is also native) and
+# no longer ships the C++ one, so only ask for it on the older versions, when
+# the extension is installed and the user hasn't picked a backend. This has to
+# happen before any of the generated modules get imported.
+def _has_cpp_protobuf():
+    if int(google.protobuf.__version__.split(".")[0]) >= 4:
+        return False
+    try:
+        return find_spec("google.protobuf.pyext._message") is not None
+    except ImportError:
+        return False
+
+_IMPL_VAR = "PROTOCOL_BUFFERS_PYTHON_IMPLEMENTATION"
+if _IMPL_VAR not in os.environ and _has_cpp_protobuf():
+    # protobuf only reads the variable when api_implementation is imported,
+    # so it is taken out again to keep it from leaking into the rest of the
+    # process.
+    os.environ[_IMPL_VAR] = "cpp"
+    try:
+        from google.protobuf.internal import api_implementation
+    finally:
+        del os.environ[_IMPL_VAR]
+
+from google.protobuf.internal import api_implementation
 from . import riakpb
-from .transport import Transport
+
+try:
+    from . import _pbc_fastpath
+except ImportError:
+    _pbc_fastpath = None
+from .transport import Transport, _IDX_SUFFIXES
+from .pool import create_connection
+from .result import GetResult
 from .exceptions import RiakngError, PBCRequestError
 
+if api_implementation.Type() == "python":
+    logger.warning(
+        "protobuf is using the pure python implementation, PBCTransport " +
+        "will be slow. Install a protobuf with the C++ or upb backend."
+    )
+
+# Every packet is a 4 byte length followed by a 1 byte message code.
+_HEADER = struct.Struct("!iB")
+
 ERROR_RESP = 0
 PING_REQ = 1
 PING_RESP = 2
@@ -58,6 +108,12 @@ INDEX_RESP = 26
 SEARCH_QUERY_REQ = 27
 SEARCH_QUERY_RESP = 28
 
+# sendmsg fails with more buffers than this, which is the usual IOV_MAX.
+_IOV_MAX = 1024
+
+# A ping has no message, so the whole packet never changes.
+_PING_PACKET = _HEADER.pack(1, PING_REQ)
+
 ONE = 4294967294
 QUORUM = 4294967293
 ALL = 4294967292
@@ -75,109 +131,239 @@ CONN_CLOSED_ERRORS = (
                         errno.EPIPE
                      )
 
+def _to_bytes(s):
+    if isinstance(s, bytes):
+        return s
+    if not isinstance(s, str):
+        s = str(s) # integer 2i values
+    return s.encode("utf-8")
+
+def repeated_bytes(message, field):
+    """Gets a repeated bytes field of a message as protobuf's own container,
+    which can be indexed and iterated like a list. Making an actual list out
+    of it converts every item up front, which adds up for millions of keys.
+    """
+    return getattr(message, field)
+
+# Marks the slots in the response code table that aren't a known code, as
+# None already means a response without a message.
+_UNKNOWN = object()
+
+def _build_respcode_table(respcode_to_class):
+    # Holds the parser of every code, or None for the codes without a message.
+    table = [_UNKNOWN] * (max(respcode_to_class) + 1)
+    for code, pbclass in respcode_to_class.items():
+        table[code] = None if pbclass is None else pbclass.FromString
+    return tuple(table)
+
 class PBCTransport(Transport):
     def __init__(self, client_id=None, host="127.0.0.1", port=8087,
-                       max_attempt=1):
+                       max_attempt=1, cm=None, recv_buf=16384,
+                       send_buf=16384):
+        """Initialize a new PBC transport.
+
+        :param max_attempt: How many times a request is sent before giving
+                            up when the connection turns out to be closed.
+        :param cm: A ConnectionManager to get sockets from and to give them
+                   back to on close. Without one a new socket is made with
+                   pool.create_connection every time this connects.
+        :param recv_buf: The socket receive buffer size. Only used without a
+                         cm, the manager's factory sets up its own sockets.
+        :param send_buf: The socket send buffer size, same as recv_buf.
+        """
         self._client_id = client_id or self.random_client_id()
         self._host = host
         self._port = port
-        self._max_attempt = max_attempt
+        # Anything less still has to try once.
+        self._max_attempt = max(1, max_attempt)
+        self._cm = cm
+        self._recv_buf = recv_buf
+        self._send_buf = send_buf
         self._socket = None
+        self._reader = None
+        self._hdr = bytearray(5)
+        self._hdr_view = memoryview(self._hdr)
+
+        # Requests are serialized before the call returns, so the messages
+        # are made once and cleared for every call. Like the socket, they
+        # make a transport unsafe to share between threads.
+        self._get_req = riakpb.kv.RpbGetReq()
+        self._list_keys_req = riakpb.kv.RpbListKeysReq()
+        self._index_req = riakpb.kv.RpbIndexReq()
+        self._del_req = riakpb.kv.RpbDelReq()
 
     def connect(self):
         if self._socket is None:
-            self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            try:
-                self._socket.connect((self._host, self._port))
-            except socket.error as e:
-                self.close()
-                raise
+            address = (self._host, self._port)
+            if self._cm is not None:
+                self._socket = self._cm.acquire(address)
+            else:
+                self._socket = create_connection(address, self._recv_buf,
+                                                 self._send_buf)
+
+    def close(self, reuse=True):
+        """Closes the connection. With a connection manager the socket is
+        given back to it instead, unless reuse is False.
+        """
+        if self._reader is not None:
+            # Has to go first, the socket isn't really closed while a file
+            # made from it is still open.
+            self._reader.close()
+            self._reader = None
 
-    def close(self):
         if self._socket is not None:
-            self._socket.close()
+            if self._cm is None:
+                self._socket.close()
+            elif reuse:
+                self._cm.release((self._host, self._port), self._socket)
+            else:
+                self._cm.discard((self._host, self._port), self._socket)
             self._socket = None
 
-    def send_packet(self, packet):
-        attempt = 0
-        for attempt in xrange(self._max_attempt):
-            e = None
+    def _sendall(self, buffers):
+        sock = self._socket
+        if not hasattr(sock, "sendmsg"):
+            for buf in buffers:
+                sock.sendall(buf)
+            return
+
+        buffers = [memoryview(buf) for buf in buffers if len(buf)]
+        start = 0
+        while start < len(buffers):
+            sent = sock.sendmsg(buffers[start:start + _IOV_MAX])
+            # sendmsg can stop anywhere, skip whatever made it out.
+            while sent:
+                n = len(buffers[start])
+                if sent >= n:
+                    sent -= n
+                    start += 1
+                else:
+                    buffers[start] = buffers[start][sent:]
+                    sent = 0
+
+    def send_packet(self, *buffers):
+        """Sends the buffers one after the other as one packet. With sendmsg
+        available they go out in a single gathered write without being
+        concatenated first.
+        """
+        last_err = None
+        for attempt in range(self._max_attempt):
+            if last_err is not None:
+                # Back off a bit before reconnecting so a server that is down
+                # doesn't get hammered.
+                time.sleep(min(0.1 * (1 << (attempt - 1)), 1.0))
+
             try:
                 self.connect()
-                self._socket.sendall(packet)
+                self._sendall(buffers)
             except socket.error as e:
-                if e[0] in CONN_CLOSED_ERRORS:
-                    self.close()
-                    continue
-                else:
+                if e.errno not in CONN_CLOSED_ERRORS:
                     raise
+                self.close(reuse=False)
+                last_err = e
             else:
-                break
+                return
 
-        if attempt + 1 == self._max_attempt and e is not None:
-            raise e
+        raise last_err
+
+    def encode_header(self, code, length):
+        return _HEADER.pack(1+length, code)
 
     def encode_message(self, code, message):
         if message is None:
-            s = ""
+            s = b""
         else:
             s = message.SerializeToString()
-        packet = struct.pack("!iB", 1+len(s), code)
-        return packet + s
+        return self.encode_header(code, len(s)) + s
+
+    def _buffered(self):
+        # Reads go through a buffer so that one recv usually gets the header
+        # and all of a small response (or the start of a big one) together.
+        # Everything read from the socket has to go through this from then
+        # on, or the buffered bytes would be skipped.
+        if self._reader is None:
+            self._reader = self._socket.makefile("rb", 65536)
+        return self._reader
 
     def recv(self, length):
         # This whole thing looks very fragile.
         if self._socket is None:
             raise RiakngError("Wait what? This is a bug as socket seems closed")
         try:
-            res = self._socket.recv(length)
+            res = self._buffered().read1(length)
+        except BaseException:
+            # Part of a packet may already have been read, and a reader that
+            # timed out refuses every read after it, so the connection can't
+            # be used again whatever the error was.
+            self.close(reuse=False)
+            raise
 
-            # Assume the socket is closed if no data is
-            # returned on a blocking read.
-            if len(res) == 0 and length > 0:
-                self.close()
+        # Assume the socket is closed if no data is
+        # returned on a blocking read.
+        if len(res) == 0 and length > 0:
+            self.close(reuse=False)
 
-            return res
-        except socket.error as e:
-            if e[0] in CONN_CLOSED_ERRORS:
-                self.close()
-            raise
+        return res
 
-    def recv_packet(self):
-        length = self.recv(4)
-        if len(length) != 4:
-            raise RiakngError(
-                "PBC protocol's response does not start with 4 bytes but " +
-                "rather {0} bytes".format(len(length))
-            )
+    def recv_into(self, view, length):
+        if self._socket is None:
+            raise RiakngError("Wait what? This is a bug as socket seems closed")
+        try:
+            n = self._buffered().readinto1(view[:length])
+        except BaseException: # Same as recv
+            self.close(reuse=False)
+            raise
 
-        length, = struct.unpack("!i", length)
-        packet = ""
-        while len(packet) < length:
-            # I'm not sure why the maximum receive length is 8192 bytes..
-            # Though I am too scared to remove it.
-            remaining_length = min(8192, length - len(packet))
-            buf = self.recv(length)
-            if not buf:
-                break # Message ended?
-            packet += buf
-
-        if len(packet) != length:
-            raise RiakngError(
-                "Packet length does not agree. Got {0}, expect {1}".format(
-                    len(packet), length
+        # Same as recv, no data on a blocking read means it's closed.
+        if n == 0 and length > 0:
+            self.close(reuse=False)
+
+        return n
+
+    def _recv_exact(self, view, n):
+        offset = 0
+        while offset < n:
+            received = self.recv_into(view[offset:], min(65536, n - offset))
+            if not received:
+                self.close(reuse=False)
+                raise RiakngError(
+                    "Connection closed after {0} of {1} bytes".format(
+                        offset, n
+                    )
                 )
-            )
+            offset += received
 
-        return packet
+    def recv_packet(self):
+        """Reads one packet.
+
+        :rtype: A (code, payload) tuple, with the payload in a bytearray (or
+                bytes if the compiled version was used).
+        """
+        sock = self._socket
+        if _pbc_fastpath is not None and sock is not None and \
+                self._reader is None and sock.gettimeout() is None:
+            try:
+                return _pbc_fastpath.recv_packet(sock.fileno())
+            except (EOFError, ValueError) as e:
+                self.close(reuse=False)
+                raise RiakngError(str(e))
+            except BaseException: # Same as recv
+                self.close(reuse=False)
+                raise
 
-    def _construct_protobuf_object(self, packet, pbclass):
-        if pbclass is None:
-            return None
+        # The length and the code are read together into the same buffer
+        # every time.
+        self._recv_exact(self._hdr_view, 5)
+        length, code = _HEADER.unpack_from(self._hdr)
+        if length < 1:
+            self.close(reuse=False)
+            raise RiakngError("Invalid packet length: {0}".format(length))
 
-        pbo = pbclass()
-        pbo.ParseFromString(packet[1:])
-        return pbo
+        # Read straight into a buffer of the right size rather than
+        # concatenating the chunks, which copies the packet over and over.
+        payload = bytearray(length - 1)
+        self._recv_exact(memoryview(payload), length - 1)
+        return code, payload
 
     RESPCODE_TO_CLASS = {
         ERROR_RESP: riakpb.commons.RpbErrorResp,
@@ -197,86 +383,133 @@ class PBCTransport(Transport):
         SEARCH_QUERY_RESP: riakpb.search.RpbSearchQueryResp,
     }
 
-    def decode_packet(self, packet):
-        code, = struct.unpack("B", packet[:1])
-        try:
-            pbclass = self.RESPCODE_TO_CLASS[code]
-        except KeyError:
+    # Codes are small and dense, so decode_packet indexes this instead of
+    # hashing into the dict for every response.
+    _RESPCODE_TABLE = _build_respcode_table(RESPCODE_TO_CLASS)
+
+    def decode_packet(self, code, payload):
+        table = self._RESPCODE_TABLE
+        parse = table[code] if code < len(table) else _UNKNOWN
+        if parse is _UNKNOWN:
             raise RiakngError("Unknown message code: {0}".format(code))
-        else:
-            pbo = self._construct_protobuf_object(packet, pbclass)
-            return code, pbo
+
+        # Every backend parses straight out of the buffer recv_packet filled,
+        # the python one wraps it in a memoryview itself.
+        if parse is None:
+            return code, None
+        return code, parse(payload)
 
     def send_message(self, code, message):
-        packet = self.encode_message(code, message)
-        self.send_packet(packet)
+        if message is None:
+            s = b""
+        else:
+            s = message.SerializeToString()
+        self.send_packet(self.encode_header(code, len(s)), s)
 
     def recv_message(self):
-        packet = self.recv_packet()
-        return self.decode_packet(packet)
+        code, payload = self.recv_packet()
+        return self.decode_packet(code, payload)
+
+    def stream_messages(self, code, message, expect):
+        """Sends a request that riak answers with a stream of messages, like
+        listing keys or mapreduce, and yields the messages as they arrive
+        until one of them has done set.
+
+        :param code: The request code.
+        :param message: The request message.
+        :param expect: The response code every message should have.
+        :rtype: A generator of response messages.
+        """
+        self.send_message(code, message)
+        done = False
+        try:
+            while not done:
+                rcode, rmessage = self.recv_message()
+                if rcode == ERROR_RESP:
+                    done = True # Riak doesn't send anything after an error
+                    raise PBCRequestError(rmessage.errmsg, rmessage.errcode)
+                if rcode != expect:
+                    raise RiakngError(
+                        "Expected response code does not match: got {0}".format(
+                            rcode
+                        )
+                    )
+
+                done = rmessage.HasField("done") and rmessage.done
+                yield rmessage
+        finally:
+            # Whatever is left of the stream is still on the socket if the
+            # caller stopped early, so it can't be used for anything else.
+            if not done:
+                self.close(reuse=False)
 
     def ping(self):
-        self.send_message(PING_REQ, None)
+        self.send_packet(_PING_PACKET)
         code, message = self.recv_message()
-        if code == PING_RESP:
-            return True
-        return False
-
-    def _merge_params(self, req, params, attrs):
-        for name in attrs:
-            if isinstance(name, (tuple, list)):
-                name, to_name = name[0], name[1]
-            else:
-                to_name = name
-            if params.get(name):
-                setattr(req, to_name, params[name])
-
+        return code == PING_RESP
+
+    def _apply_params(self, req, params, fields):
+        # Only what was given is set, so riak's defaults apply to the rest.
+        # False is a valid value for most of these.
+        for field in fields:
+            value = params.get(field.name)
+            if value is not None:
+                setattr(req, field.name, value)
+
+    # RpbContent field -> key in the decoded object. These are all None
+    # unless riak sets them, except deleted which is False. Keyed by the
+    # field descriptors so ListFields' results can be looked up directly.
+    _CONTENT_FIELD_MAP = dict(
+        (riakpb.kv.RpbContent.DESCRIPTOR.fields_by_name[name], key)
+        for name, key in (
+            ("content_type", "content-type"),
+            ("charset", "charset"),
+            ("content_encoding", "content-encoding"),
+            ("vtag", "vtag"),
+            # This will cause a divergence between the HTTP and PBC api
+            ("last_mod", "last-modified"),
+            ("deleted", "deleted"),
+        )
+    )
+    _CONTENT_DEFAULTS = dict.fromkeys(_CONTENT_FIELD_MAP.values())
+    _CONTENT_DEFAULTS["deleted"] = False
 
     def decode_content(self, content):
-        obj = {}
+        obj = self._CONTENT_DEFAULTS.copy()
         obj["meta"] = meta = {}
         obj["indexes"] = indexes = {}
         obj["links"] = links = []
         obj["data"] = content.value
 
-        if content.HasField("deleted"):
-            obj["deleted"] = True
-
-        if content.HasField("content_type"):
-            obj["content-type"] = content.content_type
-        else:
-            obj["content-type"] = None
-
-        if content.HasField("charset"):
-            obj["charset"] = content.charset
-        else:
-            obj["charset"] = None
-
-        if content.HasField("content_encoding"):
-            obj["content-encoding"] = content.content_encoding
-        else:
-            obj["content-encoding"] = None
-
-        if content.HasField("vtag"):
-            obj["vtag"] = content.vtag
-        else:
-            obj["vtag"] = None
-
-        if content.HasField("last_mod"):
-            # This will cause a divergence between the HTTP
-            # and PBC api
-            obj["last-modified"] = content.last_mod
-        else:
-            obj["last-modified"] = None
+        # ListFields only gives back the fields that are set, which is one
+        # call instead of a HasField and a getattr for every field. Getting
+        # all of them at once with an attrgetter would be just as cheap, but
+        # an unset field reads as its default and would come out as "" or 0
+        # instead of None.
+        field_map = self._CONTENT_FIELD_MAP
+        for field, value in content.ListFields():
+            name = field_map.get(field)
+            if name is not None:
+                obj[name] = value
 
         # TODO: work on links, meta, indexes
 
+        return obj
+
     _rw_names = {
         "default": DEFAULT,
         "all": ALL,
         "quorum": QUORUM,
         "one" : ONE
     }
+    # Looked up once here, which also makes a missing field in the generated
+    # protobuf classes fail at import instead of on the first get.
+    _GET_PARAM_FIELDS = tuple(
+        riakpb.kv.RpbGetReq.DESCRIPTOR.fields_by_name[name]
+        for name in ("pr", "notfound_ok", "basic_quorum", "head",
+                     "deletedvclock", "if_modified")
+    )
+
     def get(self, bucket, key, r=None, vclock=None, headers=None, **params):
         """Same as the Transport's get. However, headers is ignored and there
         are some more attributes in the params as defined in:
@@ -285,48 +518,177 @@ class PBCTransport(Transport):
 
         Note that if_modified is a params, not in headers like the HTTP request
         """
-        req = riakpb.kv.RpbGetReq()
+        self.send_message(GET_REQ, self._get_request(bucket, key, r, params))
+        code, message = self.recv_message()
+        return self._get_response(key, code, message)
+
+    def multi_get(self, bucket_keys, r=None, pipeline_depth=64, **params):
+        """Same as the Transport's multi_get. The requests are written to the
+        socket pipeline_depth at a time, and the responses to each batch are
+        read back before the next one is sent. Riak answers them in order on
+        a connection.
+
+        Writing all of them at once could deadlock: riak stops reading
+        requests while it can't write its responses, which it can't while
+        this is still writing and not reading. A batch of requests is small
+        enough to fit in the socket buffers.
+        """
+        bucket_keys = list(bucket_keys)
+        responses = []
+        for i in range(0, len(bucket_keys), pipeline_depth):
+            batch = bucket_keys[i:i + pipeline_depth]
+
+            buffers = []
+            for bucket, key in batch:
+                s = self._get_request(bucket, key, r,
+                                      params).SerializeToString()
+                buffers.append(self.encode_header(GET_REQ, len(s)))
+                buffers.append(s)
+            self.send_packet(*buffers)
+
+            # All of the responses have to be read even if one of them turns
+            # out to be an error, or they'd be left on the socket.
+            try:
+                responses.extend([self.recv_message() for _ in batch])
+            except Exception:
+                self.close(reuse=False)
+                raise
+
+        return [self._get_response(key, code, message)
+                for (bucket, key), (code, message)
+                in zip(bucket_keys, responses)]
+
+    def _get_request(self, bucket, key, r, params):
+        req = self._get_req
+        req.Clear()
         if r:
             req.r = self._rw_names.get(r)
 
-        self._merge_params(req, params,
-            ("pr", "notfound_ok", "basic_quorum", "head", "deletedvclock", "if_modified")
-        )
+        self._apply_params(req, params, self._GET_PARAM_FIELDS)
 
-        req.bucket = bucket
-        req.key = key
+        req.bucket = _to_bytes(bucket)
+        req.key = _to_bytes(key)
+        return req
 
-        self.send_message(GET_REQ, req)
-        code, message = self.recv_message()
+    def _get_response(self, key, code, message):
+        if code == ERROR_RESP:
+            raise PBCRequestError(message.errmsg, message.errcode)
+        elif code == GET_RESP:
+            # An unchanged response has no content either, so this has to be
+            # checked before deciding that the key is not there.
+            if message.HasField("unchanged") and message.unchanged:
+                return GetResult(status="not_modified", siblings=[])
 
-        r = {}
-        if code == GET_RESP:
-            if len(message.content):
+            if not len(message.content):
                 raise PBCRequestError("Key {0} not found".format(key), 404)
 
-            if message.HasField("unchanged") and message.unchanged:
-                r["status"] = "not_modified"
-            else:
-                r["status"] = "ok"
-
             if message.HasField("vclock"):
                 vclock = message.vclock
             else:
                 vclock = None
 
-            contents = []
-            for c in message.content:
-                cont = self.decode_content(c)
-                c["vclock"] = vclock
-                contents.append(self.decode_content(c))
-
-            r["siblings"] = contents
+            contents = [dict(self.decode_content(c), vclock=vclock)
+                        for c in message.content]
 
             if len(contents) > 1:
-                r["status"] = "multiple_choice"
+                status = "multiple_choice"
+            else:
+                status = "ok"
+
+            return GetResult(status=status, siblings=contents)
+        else:
+            raise RiakngError(
+                "Expected response code does not match: got {0}".format(code)
+            )
+
+    # All of these take the same values as r in get.
+    _DEL_PARAM_FIELDS = tuple(
+        riakpb.kv.RpbDelReq.DESCRIPTOR.fields_by_name[name]
+        for name in ("r", "w", "pr", "pw", "dw")
+    )
+
+    def delete(self, bucket, key, rw=None, vclock=None, **params):
+        """Same as the Transport's delete. The params are the ones defined
+        in:
+
+        http://docs.basho.com/riak/latest/references/apis/protocol-buffers/PBC-Delete-Object/
+        """
+        req = self._del_req
+        req.Clear()
+        req.bucket = _to_bytes(bucket)
+        req.key = _to_bytes(key)
+        if rw:
+            req.rw = self._rw_names.get(rw, rw)
+        if vclock:
+            req.vclock = vclock
+
+        for field in self._DEL_PARAM_FIELDS:
+            value = params.get(field.name)
+            if value is not None:
+                setattr(req, field.name, self._rw_names.get(value, value))
+
+        self.send_message(DEL_REQ, req)
+        code, message = self.recv_message()
+        if code == ERROR_RESP:
+            raise PBCRequestError(message.errmsg, message.errcode)
+        elif code != DEL_RESP:
+            raise RiakngError(
+                "Expected response code does not match: got {0}".format(code)
+            )
+        # Riak answers the same way whether the key was there or not.
+        return True
+
+    def multi_delete(self, bucket_keys, **params):
+        """Same as the Transport's multi_delete. The deletes are made one
+        after the other on this transport's connection.
+        """
+        return [self.delete(bucket, key, **params)
+                for bucket, key in bucket_keys]
+
+    def get_keys(self, bucket):
+        """Same as the Transport's get_keys, except that the keys are the raw
+        bytes riak stores.
+        """
+        req = self._list_keys_req
+        req.Clear()
+        req.bucket = _to_bytes(bucket)
 
-            return # TODO: stuff
+        keys = []
+        for message in self.stream_messages(LIST_KEYS_REQ, req, LIST_KEYS_RESP):
+            keys.extend(repeated_bytes(message, "keys"))
+        return keys
+
+    def index(self, bucket, field, start, end=None, collect=True):
+        """Same as the Transport's index, except that the keys are the raw
+        bytes riak stores.
+
+        Riak answers a 2i query with a single message, so collect=False only
+        saves copying the keys out of it, not reading the whole answer.
+        """
+        # A field needs at least one character in front of the suffix.
+        if len(field) < 5 or field[-4:] not in _IDX_SUFFIXES:
+            raise RiakngError("2i fields must end with either _bin or _int.")
+
+        req = self._index_req
+        req.Clear()
+        req.bucket = _to_bytes(bucket)
+        req.index = _to_bytes(field)
+        if end is None:
+            req.qtype = riakpb.kv.RpbIndexReq.eq
+            req.key = _to_bytes(start)
         else:
+            req.qtype = riakpb.kv.RpbIndexReq.range
+            req.range_min = _to_bytes(start)
+            req.range_max = _to_bytes(end)
+
+        self.send_message(INDEX_REQ, req)
+        code, message = self.recv_message()
+        if code == ERROR_RESP:
+            raise PBCRequestError(message.errmsg, message.errcode)
+        elif code != INDEX_RESP:
             raise RiakngError(
                 "Expected response code does not match: got {0}".format(code)
             )
+
+        keys = repeated_bytes(message, "keys")
+        return list(keys) if collect else iter(keys)
@@ -0,0 +1,300 @@
+# -*- coding: utf-8 -*-
+# Copyright 2012 Shuhao Wu <shuhao@shuhaowu.com>
+#
+# This file is provided to you under the Apache License,
+# Version 2.0 (the "License"); you may not use this file
+# except in compliance with the License.  You may obtain
+# a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+from __future__ import absolute_import
+
+import contextlib
+import errno
+import functools
+import socket
+import threading
+import time
+
+from .exceptions import RiakngError
+
+def create_connection(address, recv_buf=16384, send_buf=16384):
+    """Opens a TCP connection set up the way the PBC transport wants it.
+
+    :param address: A (host, port) tuple.
+    :param recv_buf: The size of the socket's receive buffer.
+    :param send_buf: The size of the socket's send buffer.
+    :rtype: A connected socket.
+    """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        # The header and the message are written separately, so don't let
+        # Nagle hold back the second write.
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        # These have to be set before connecting for the window to use them.
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, recv_buf)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, send_buf)
+        sock.connect(address)
+    except socket.error:
+        sock.close()
+        raise
+    return sock
+
+def _is_alive(sock):
+    # An idle socket should have nothing to read. EOF means the server hung up
+    # and leftover bytes mean it is out of sync with the protocol, neither is
+    # usable.
+    timeout = sock.gettimeout()
+    try:
+        sock.setblocking(False)
+        sock.recv(1, socket.MSG_PEEK)
+    except socket.error as e:
+        return e.errno in (errno.EAGAIN, errno.EWOULDBLOCK)
+    finally:
+        sock.settimeout(timeout)
+    return False
+
+class ConnectionPool(object):
+    """A bounded pool of connections to one server. There are never more than
+    maxconn connections open, idle or not.
+
+    Idle connections are handed out most recently used first, so the ones
+    that are used stay warm and the rest time out.
+
+    This is thread safe.
+    """
+
+    def __init__(self, factory, minconn=0, maxconn=16, idle_timeout=60,
+                 timeout=None):
+        """Initialize a new connection pool.
+
+        :param factory: Called without arguments to open a new connection.
+        :param minconn: The number of connections opened right away.
+        :param maxconn: The maximum number of connections open at a time.
+        :param idle_timeout: Connections idle for longer than this many
+                             seconds are closed instead of handed out again.
+        :param timeout: How many seconds get waits for a connection when
+                        maxconn are in use. None waits forever.
+        """
+        self._factory = factory
+        self._maxconn = maxconn
+        self._idle_timeout = idle_timeout
+        self._timeout = timeout
+        # (connection, last used) pairs, the most recently used one last.
+        self._idle = []
+        # Guards both _idle and _size. Waiters in get are woken up whenever
+        # a connection comes back or a slot for a new one frees up.
+        self._cond = threading.Condition(threading.Lock())
+        self._size = 0
+
+        opened = []
+        try:
+            for i in range(min(minconn, maxconn)):
+                with self._cond:
+                    self._size += 1
+                opened.append(self._create())
+        except Exception:
+            # Nobody gets to use this pool, so nothing else would close them.
+            for conn in opened:
+                conn.close()
+            raise
+
+        for conn in opened:
+            self.put(conn)
+
+    def _create(self):
+        # The slot has to be taken already.
+        try:
+            return self._factory()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+
+    def get(self):
+        """Gets a connection, either an idle one or a new one. Every
+        connection has to be given back with put or discard.
+
+        :rtype: A connection.
+        """
+        if self._timeout is not None:
+            deadline = time.monotonic() + self._timeout
+
+        while True:
+            with self._cond:
+                # All of them are in use, wait for one to come back or to be
+                # discarded.
+                while not self._idle and self._size >= self._maxconn:
+                    if self._timeout is None:
+                        self._cond.wait()
+                        continue
+
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise RiakngError(
+                            "No connection available after {0} seconds".format(
+                                self._timeout
+                            )
+                        )
+                    self._cond.wait(remaining)
+
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                else:
+                    self._size += 1
+                    conn = None
+
+            if conn is None:
+                return self._create()
+
+            if time.monotonic() - last_used <= self._idle_timeout and \
+                    _is_alive(conn):
+                return conn
+            self.discard(conn)
+
+    def put(self, conn):
+        """Gives back a connection that is no longer used. It must not be in
+        the middle of a request.
+        """
+        with self._cond:
+            # Can only be full if it didn't come from this pool.
+            if len(self._idle) < self._maxconn:
+                self._idle.append((conn, time.monotonic()))
+                self._cond.notify()
+                return
+        conn.close()
+
+    def discard(self, conn):
+        """Closes a connection from get that can't be used anymore, making
+        room for a new one.
+        """
+        conn.close()
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+    @contextlib.contextmanager
+    def acquire(self):
+        """Gets a connection for the duration of a with block. It is given
+        back at the end, or discarded if the block raised.
+        """
+        conn = self.get()
+        try:
+            yield conn
+        except Exception:
+            self.discard(conn)
+            raise
+        else:
+            self.put(conn)
+
+    def close_all(self):
+        """Closes every idle connection."""
+        with self._cond:
+            idle = self._idle
+            self._idle = []
+
+        for conn, last_used in idle:
+            self.discard(conn)
+
+class ConnectionManager(object):
+    """Keeps a ConnectionPool for every (host, port), so that transports
+    talking to the same server share connections instead of connecting again
+    every time.
+
+    This is thread safe, one manager can be shared by many transports.
+    """
+
+    def __init__(self, factory=create_connection, **pool_args):
+        """Initialize a new connection manager.
+
+        :param factory: Called with a (host, port) tuple to open a new
+                        connection.
+        :param pool_args: Passed to every ConnectionPool, see its arguments.
+        """
+        self._factory = factory
+        self._pool_args = pool_args
+        self._pools = {}
+        # The pool every acquired socket came from, which is the one it has
+        # to go back to. That pool may be closed and gone from _pools by then.
+        self._owners = {}
+        self._lock = threading.Lock()
+
+    def pool(self, address):
+        """Gets the pool for an address, creating it if needed.
+
+        :param address: A (host, port) tuple.
+        :rtype: A ConnectionPool.
+        """
+        with self._lock:
+            pool = self._pools.get(address)
+            if pool is None:
+                pool = self._pools[address] = ConnectionPool(
+                    functools.partial(self._factory, address),
+                    **self._pool_args
+                )
+            return pool
+
+    def acquire(self, address):
+        """Gets a connection to address from its pool. It has to be given
+        back with release or discard.
+
+        :param address: A (host, port) tuple.
+        :rtype: A connected socket.
+        """
+        pool = self.pool(address)
+        sock = pool.get()
+        with self._lock:
+            self._owners[sock] = pool
+        return sock
+
+    def release(self, address, sock):
+        """Gives back a socket that is no longer used by a transport. It must
+        not be in the middle of a request.
+
+        :param address: The (host, port) tuple the socket is connected to.
+        :param sock: The socket.
+        """
+        with self._lock:
+            pool = self._owners.pop(sock, None)
+            # A pool that close_all got rid of would keep it idle forever.
+            if self._pools.get(address) is not pool:
+                pool = None
+
+        if pool is None:
+            sock.close()
+        else:
+            pool.put(sock)
+
+    def discard(self, address, sock):
+        """Closes a socket from acquire that can't be used anymore.
+
+        :param address: The (host, port) tuple the socket is connected to.
+        :param sock: The socket.
+        """
+        with self._lock:
+            pool = self._owners.pop(sock, None)
+
+        # Only the pool it came from counted it, closed or not.
+        if pool is None:
+            sock.close()
+        else:
+            pool.discard(sock)
+
+    def close_all(self):
+        """Closes every idle socket."""
+        with self._lock:
+            pools = list(self._pools.values())
+            self._pools.clear()
+
+        for pool in pools:
+            pool.close_all()
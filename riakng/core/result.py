@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+# Copyright 2012 Shuhao Wu <shuhao@shuhaowu.com>
+#
+# This file is provided to you under the Apache License,
+# Version 2.0 (the "License"); you may not use this file
+# except in compliance with the License.  You may obtain
+# a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+from __future__ import absolute_import
+
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
+
+class _Result(Mapping):
+    """Read only mapping over the slots that were set. They can also be read
+    as attributes. Used instead of a dict as there's one of these for every
+    request.
+    """
+    __slots__ = ()
+
+    def __init__(self, **fields):
+        for name, value in fields.items():
+            setattr(self, name, value)
+
+    def __getitem__(self, key):
+        if key in self.__slots__:
+            try:
+                return getattr(self, key)
+            except AttributeError: # Not set
+                pass
+        raise KeyError(key)
+
+    def __iter__(self):
+        return (name for name in self.__slots__ if hasattr(self, name))
+
+    def __len__(self):
+        return sum(1 for name in self)
+
+    def __repr__(self):
+        return "{0}({1})".format(type(self).__name__, ", ".join(
+            "{0}={1!r}".format(name, getattr(self, name)) for name in self
+        ))
+
+class GetResult(_Result):
+    """What a get returns, see Transport.get."""
+    __slots__ = ("status", "headers", "siblings")
+
+class PutResult(_Result):
+    """What a put returns, see Transport.put."""
+    __slots__ = ("status", "headers", "siblings", "key")
@@ -18,12 +18,54 @@
 # specific language governing permissions and limitations
 # under the License.
 
-import base64
+import functools
 import random
-import platform
+import struct
 import threading
+import time
 import os
 
+from binascii import b2a_base64
+
+# Every 2i field name has to end with one of these.
+_IDX_SUFFIXES = frozenset(("_bin", "_int"))
+
+# fixed_client_id's results, by (pid, thread id).
+_FIXED_ID_CACHE = {}
+
+# Neither of these changes within a process, except the pid in a forked child.
+# They are only looked up the first time they're needed.
+@functools.lru_cache(maxsize=1)
+def _node():
+    import platform # Slow to import and rarely needed
+    return platform.node().encode("utf-8")
+
+@functools.lru_cache(maxsize=1)
+def _pid():
+    return os.getpid()
+
+# Every thread gets its own generator for random client ids, so that they
+# don't all wait on the lock of the shared one.
+_TLS = threading.local()
+
+def _rng():
+    try:
+        return _TLS.rng
+    except AttributeError:
+        rng = _TLS.rng = random.Random()
+        return rng
+
+def _after_fork():
+    global _TLS
+    _pid.cache_clear()
+    _FIXED_ID_CACHE.clear()
+    # The child would otherwise carry on with the parent's generator and
+    # hand out the same ids.
+    _TLS = threading.local()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork)
+
 class Transport(object):
     """Lowest level of API which handles the transports,
     which handles communicating with the server.
@@ -56,21 +98,38 @@ class Transport(object):
         Note that subclass that implements this should have all arguments be
         keyword arguments. cm and client_id should always exists.
 
-        :param cm: Connection Manager Instance.
+        A transport holds at most one connection at a time. With a connection
+        manager it acquires the connection from the manager's pool when it
+        connects and releases it back on close, or discards it if it broke.
+        Connections must only be released between requests.
+
+        Transports that open their own sockets may also take recv_buf and
+        send_buf, the socket buffer sizes, which default to 16 KiB.
+
+        :param cm: Connection Manager Instance, see pool.ConnectionManager.
         :param client_id: A client ID.
         """
         raise NotImplementedError
 
     @classmethod
     def random_client_id(cls):
-        return "py2_%s" % base64.b64encode(str(random.randint(1, 0x40000000)))
+        client_id = struct.pack(">I", _rng().getrandbits(30))
+        return "py2_" + b2a_base64(client_id, newline=False).decode("ascii")
 
     @classmethod
     def fixed_client_id(cls):
-        machine = platform.node()
-        process = os.getpid()
-        thread = threading.currentThread().getName()
-        return base64.b64encode("%s|%s|%s" % (machine, process, thread))
+        process = _pid()
+        thread = threading.get_ident()
+        try:
+            return _FIXED_ID_CACHE[(process, thread)]
+        except KeyError:
+            pass
+
+        client_id = b2a_base64(
+            b"%s|%d|%d" % (_node(), process, thread), newline=False
+        ).decode("ascii")
+        _FIXED_ID_CACHE[(process, thread)] = client_id
+        return client_id
 
     def ping(self):
         """Check if server is alive.
@@ -97,7 +156,9 @@ class Transport(object):
         :type headers: dict
         :param params: Additional optional parameters. Check the same link as
                        headers. Does not include r or vclock
-        :rtype: Returns a dictionary. This dictionary can be a little messy:
+        :rtype: Returns a GetResult, a read only mapping that can be used like
+                a dictionary (or its fields read as attributes). It can be a
+                little messy:
                 "status" : "ok" or "multiple_choice" or "not_modified"
                 "headers" : the http response headers if the transport is http
                 "siblings": [object_data], object_data has the format of the
@@ -140,14 +201,36 @@ class Transport(object):
                         X-Riak-Meta-
         :type headers: dict
         :param params: Any optional parameters as indicated in the same page.
-        :rtype: A dictionary of things returned from Riak. This dictionary will
-                always include 'key', which is the key of the new/updated object
+        :rtype: A PutResult of things returned from Riak, a read only mapping
+                like the GetResult of get. It will always include 'key', which
+                is the key of the new/updated object
                 If returnbody=True, the response will look exactly like the get
-                return, except with the added 'key' field. (i.e. the dictionary
+                return, except with the added 'key' field. (i.e. the mapping
                 will now contain a "key" and a "siblings" field)
         """
         raise NotImplementedError
 
+    def multi_get(self, bucket_keys, **params):
+        """Gets many objects at once. How the requests overlap depends on the
+        transport.
+
+        :param bucket_keys: An iterable of (bucket, key) pairs.
+        :param params: Passed to every get.
+        :rtype: A list of what get returns, in the same order as bucket_keys.
+        """
+        raise NotImplementedError
+
+    def multi_put(self, items, **params):
+        """Puts many objects at once. How the requests overlap depends on the
+        transport.
+
+        :param items: An iterable of tuples with the positional arguments of
+                      put, starting with (bucket, key, content, content_type).
+        :param params: Passed to every put.
+        :rtype: A list of what put returns, in the same order as items.
+        """
+        raise NotImplementedError
+
     def delete(self, bucket, key, **params):
         """Deletes an object from the database.
 
@@ -161,7 +244,18 @@ class Transport(object):
         """
         raise NotImplementedError
 
-    def index(self, bucket, field, start, end=None):
+    def multi_delete(self, bucket_keys, **params):
+        """Deletes many objects at once. How the requests overlap depends on
+        the transport.
+
+        :param bucket_keys: An iterable of (bucket, key) pairs.
+        :param params: Passed to every delete.
+        :rtype: A list of what delete returns, in the same order as
+                bucket_keys.
+        """
+        raise NotImplementedError
+
+    def index(self, bucket, field, start, end=None, collect=True):
         """Perform an indexing operation.
 
         :param bucket: The bucket name
@@ -169,7 +263,10 @@ class Transport(object):
         :param start: The start value
         :param end: The end value. Defaults to None. If left as None, start w
                     be used as an exact value.
-        :rtypes: A list of keys.
+        :param collect: If False, the keys are yielded as they are read
+                        instead of being collected in a list first, which
+                        keeps memory flat for large ranges.
+        :rtypes: A list of keys, or an iterator over them if collect is False.
         """
         raise NotImplementedError
 
@@ -220,11 +317,36 @@ class Transport(object):
     def get_bucket_properties(self, bucket):
         """Get a list of bucket properties.
 
+        Implementations can keep the result for _bucket_props_ttl seconds
+        with the _cached_bucket_properties helpers, as properties rarely
+        change. Changes made by other clients show up after that.
+
         :param bucket: The bucket name
         :rtype: A dictionary of bucket properties.
         """
         raise NotImplementedError
 
+    # How long bucket properties are reused for, in seconds. 0 turns it off.
+    _bucket_props_ttl = 30
+
+    def _cached_bucket_properties(self, bucket):
+        # Expects self._bucket_props_cache = {} and self._bucket_props_lock
+        # from the subclass' __init__. Copies are handed out, so the caller
+        # can change what it gets without changing the cache.
+        entry = self._bucket_props_cache.get(bucket)
+        if entry is not None and entry[0] > time.monotonic():
+            return dict(entry[1])
+        return None
+
+    def _cache_bucket_properties(self, bucket, properties):
+        expiry = time.monotonic() + self._bucket_props_ttl
+        with self._bucket_props_lock:
+            self._bucket_props_cache[bucket] = (expiry, dict(properties))
+
+    def _invalidate_bucket_properties(self, bucket):
+        with self._bucket_props_lock:
+            self._bucket_props_cache.pop(bucket, None)
+
     def set_bucket_properties(self, bucket, properties):
         """Sets bucket properties. Raises an error if fails.
 
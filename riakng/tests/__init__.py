@@ -16,10 +16,3 @@
 # under the License.
 
 from __future__ import absolute_import
-
-from ..core.http import HTTPTransport
-
-def cleanup_bucket_keys(self, bucketkeys):
-    transport = HTTPTransport()
-    for bucket, key in bucketkeys:
-        transport.delete(bucket, key)
@@ -17,28 +17,38 @@
 
 from __future__ import absolute_import
 
+import json
+import socket
+import threading
 import unittest
 
-from ..core.http import HTTPTransport
+from ..core.http import HTTPTransport, _iter_index_keys
 from ..core.pbc import PBCTransport
-from ..core.exceptions import RequestError
-from . import cleanup_bucket_keys
+from ..core.pool import ConnectionPool, ConnectionManager, create_connection
+from ..core.result import PutResult
+from ..core.exceptions import RequestError, RiakngError
 
-# (bucket, key) pair and to be deleted when all tests are ran.
-# For the times when shit fails. That and we also need to get the test
-# server going
-bucket_key_cleanups = [] # mmmm global variables
+# Shared by every PBC transport in here, so the connections stay open from
+# one test case to the next.
+_CM = ConnectionManager(minconn=4, maxconn=16)
+
+def tearDownModule():
+    _CM.close_all()
 
 class CoreFeatureTests(object):
     """This class is to be extended and the transports are to be filled in.
     """
 
+    def setUp(self):
+        # (bucket, key) pairs to be deleted after the test, even if it fails.
+        self._delete_later = []
+
     def test_ping(self):
         self.assertTrue(self.transport.ping())
 
     def test_get_put_delete(self):
         bucket, key = "test_bucket", "test_get_key"
-        bucket_key_cleanups.append((bucket, key))
+        self._delete_later.append((bucket, key))
 
         # Put something into the db
         r = self.transport.put(bucket, key, "hello world", "text/plain")
@@ -71,7 +81,7 @@ class CoreFeatureTests(object):
         r = self.transport.put(bucket, key, "look ma no key!", "text/plain")
         self.assertTrue("key" in r)
         key = r["key"]
-        bucket_key_cleanups.append((bucket, key))
+        self._delete_later.append((bucket, key))
         self.assertEquals("created", r["status"])
 
         r = self.transport.get(bucket ,key)
@@ -80,7 +90,7 @@ class CoreFeatureTests(object):
 
     def test_put_return_body(self):
         bucket, key = "test_bucket", "test_return_body"
-        bucket_key_cleanups.append((bucket, key))
+        self._delete_later.append((bucket, key))
         r = self.transport.put(bucket, key, "returning body", "text/plain",
                                returnbody=True)
         self.assertEquals("ok", r["status"])
@@ -89,7 +99,7 @@ class CoreFeatureTests(object):
 
     def test_put_with_indexes(self):
         bucket, key = "test_bucket", "test_put_indexes"
-        bucket_key_cleanups.append((bucket, key))
+        self._delete_later.append((bucket, key))
 
         self.transport.put(bucket, key, "indexes!", "text/plain",
             indexes=[("field1_bin", "test"), ("field2_int", 2)])
@@ -101,10 +111,10 @@ class CoreFeatureTests(object):
 
     def test_put_with_links(self):
         bucket, key1 = "test_bucket", "test_put_links"
-        bucket_key_cleanups.append((bucket, key1))
+        self._delete_later.append((bucket, key1))
 
         key2 = "test_linked"
-        bucket_key_cleanups.append((bucket, key2))
+        self._delete_later.append((bucket, key2))
 
         self.transport.put(bucket, key2, "linked", "text/plain")
 
@@ -116,7 +126,7 @@ class CoreFeatureTests(object):
 
     def test_put_with_meta(self):
         bucket, key = "test_bucket", "test_put_meta"
-        bucket_key_cleanups.append((bucket, key))
+        self._delete_later.append((bucket, key))
 
         self.transport.put(bucket, key, "metas!", "text/plain",
                 meta={"somemeta": 1, "someothermeta": "lol"})
@@ -128,13 +138,13 @@ class CoreFeatureTests(object):
     def test_index_operation_single(self):
         bucket, key1 = "test_bucket", "test_key1"
         key2 = "test_key2"
-        bucket_key_cleanups.append((bucket, key1))
-        bucket_key_cleanups.append((bucket, key2))
+        self._delete_later.append((bucket, key1))
+        self._delete_later.append((bucket, key2))
 
-        self.transport.put(bucket, key1, "a", "text/plain",
-                indexes=[("email_bin", "test@example.com")])
-        self.transport.put(bucket, key2, "b", "text/plain",
-                indexes=[("email_bin", "test@example.com")])
+        self.transport.multi_put([
+            (bucket, key1, "a", "text/plain"),
+            (bucket, key2, "b", "text/plain")
+        ], indexes=[("email_bin", "test@example.com")])
 
         keys = self.transport.index(bucket, "email_bin", "test@example.com")
         self.assertEquals(2, len(keys))
@@ -143,13 +153,13 @@ class CoreFeatureTests(object):
 
     def test_index_operation_range(self):
         bucket, key1, key2 = "test_bucket", "test_key1", "test_key2"
-        bucket_key_cleanups.append((bucket, key1))
-        bucket_key_cleanups.append((bucket, key2))
+        self._delete_later.append((bucket, key1))
+        self._delete_later.append((bucket, key2))
 
-        self.transport.put(bucket, key1, "a", "text/plain",
-                indexes=[("field_int", 2)])
-        self.transport.put(bucket, key2, "b", "text/plain",
-                indexes=[("field_int", 4)])
+        self.transport.multi_put([
+            (bucket, key1, "a", "text/plain", None, [("field_int", 2)]),
+            (bucket, key2, "b", "text/plain", None, [("field_int", 4)])
+        ])
 
         keys = self.transport.index(bucket, "field_int", 2, 3)
         self.assertEquals(1, len(keys))
@@ -160,6 +170,12 @@ class CoreFeatureTests(object):
         self.assertTrue(key1 in keys)
         self.assertTrue(key2 in keys)
 
+        keys = list(self.transport.index(bucket, "field_int", 2, 5,
+                                         collect=False))
+        self.assertEquals(2, len(keys))
+        self.assertTrue(key1 in keys)
+        self.assertTrue(key2 in keys)
+
     def test_mapreduce(self):
         raise NotImplementedError("Implement this unittest!")
 
@@ -179,9 +195,12 @@ class CoreFeatureTests(object):
         bucket, key1, key2, key3 = "test_get_keys_bucket", \
                                    "test_key1", "test_key2", "test_key3"
 
-        self.transport.put(bucket, key1, "a", "text/plain")
-        self.transport.put(bucket, key2, "a", "text/plain")
-        self.transport.put(bucket, key3, "a", "text/plain")
+        r = self.transport.multi_put([
+            (bucket, key1, "a", "text/plain"),
+            (bucket, key2, "b", "text/plain"),
+            (bucket, key3, "c", "text/plain")
+        ])
+        self.assertEquals([key1, key2, key3], [x["key"] for x in r])
 
         keys = self.transport.get_keys(bucket)
         self.assertEquals(3, len(keys))
@@ -190,25 +209,37 @@ class CoreFeatureTests(object):
         self.assertEquals(key2, keys[1])
         self.assertEquals(key3, keys[2])
 
+        r = self.transport.multi_get([(bucket, k) for k in keys])
+        self.assertEquals(["a", "b", "c"],
+                          [x["siblings"][0]["data"] for x in r])
+
     def tearDown(self):
-        clean_up_bucket_keys(bucket_key_cleanups)
+        self.transport.multi_delete(self._delete_later)
 
-class PBCCoreTests(unittest.TestCase, CoreFeatureTests):
-    def setUp(self):
-        if not hasattr(self, "transport"):
-            self.transport = PBCTransport()
+class PBCCoreTests(CoreFeatureTests, unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.transport = PBCTransport(cm=_CM)
 
-class HTTPCoreTests(unittest.TestCase, CoreFeatureTests):
-    def setUp(self):
-        if not hasattr(self, "transport"):
-            self.transport = HTTPTransport()
+    @classmethod
+    def tearDownClass(cls):
+        cls.transport.close()
+
+class HTTPCoreTests(CoreFeatureTests, unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.transport = HTTPTransport()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.transport.close()
 
     def test_link_walk(self):
         bucket, key1, key2, key3 = "test_bucket", "test_key1", \
                                    "test_key2", "test_key3"
-        bucket_key_cleanups.append((bucket, key1))
-        bucket_key_cleanups.append((bucket, key2))
-        bucket_key_cleanups.append((bucket, key3))
+        self._delete_later.append((bucket, key1))
+        self._delete_later.append((bucket, key2))
+        self._delete_later.append((bucket, key3))
 
         self.transport.put(bucket, key1, "test1", "text/plain")
         self.transport.put(bucket, key2, "test2", "text/plain",
@@ -241,7 +272,197 @@ class HTTPCoreTests(unittest.TestCase, CoreFeatureTests):
         self.assertEquals(key2, l[0][1]["key"])
         self.assertEquals(key1, l[1][0]["key"])
 
+    def test_get_lazy(self):
+        bucket, key = "test_bucket", "test_get_lazy"
+        self._delete_later.append((bucket, key))
+
+        self.transport.put(bucket, key, "lazy!", "text/plain",
+                meta={"somemeta": "lol"}, indexes=[("field1_bin", "test")])
+
+        r = self.transport.get(bucket, key, lazy=True)
+        self.assertEquals("ok", r["status"])
+        sibling = r["siblings"][0]
+        self.assertEquals("lazy!", sibling["data"])
+        self.assertTrue(sibling.get("vclock"))
+        self.assertEquals({"somemeta": "lol"}, sibling.meta)
+        self.assertEquals({"field1_bin": ["test"]}, sibling["indexes"])
+        self.assertEquals([], sibling["links"])
+
+class ConnectionPoolTests(unittest.TestCase):
+    def factory(self):
+        a, b = socket.socketpair()
+        self.peers.append(b)
+        self.addCleanup(a.close)
+        self.addCleanup(b.close)
+        return a
+
+    def setUp(self):
+        self.peers = []
+
+    def test_get_put(self):
+        pool = ConnectionPool(self.factory, maxconn=2)
+        a = pool.get()
+        b = pool.get()
+        self.assertFalse(a is b)
+
+        pool.put(a)
+        pool.put(b)
+        self.assertTrue(pool.get() is b) # Most recently used first
+        self.assertTrue(pool.get() is a)
+        self.assertEquals(2, len(self.peers))
+
+    def test_maxconn(self):
+        pool = ConnectionPool(self.factory, maxconn=1, timeout=0.01)
+        a = pool.get()
+        self.assertRaises(RiakngError, pool.get)
+
+        pool.discard(a)
+        self.assertEquals(-1, a.fileno())
+        self.assertFalse(pool.get() is a)
+
+    def test_discard_wakes_up_waiter(self):
+        pool = ConnectionPool(self.factory, maxconn=1)
+        a = pool.get()
+        got = []
+        waiter = threading.Thread(target=lambda: got.append(pool.get()))
+        waiter.start()
+        waiter.join(0.05) # Blocked, the pool is full
+
+        pool.discard(a)
+        waiter.join(5)
+        self.assertFalse(waiter.is_alive())
+        self.assertEquals(2, len(self.peers))
+        self.assertTrue(got[0] is not a)
+
+    def test_get_drops_dead_connections(self):
+        pool = ConnectionPool(self.factory, minconn=2)
+        self.peers[0].close()
+        self.peers[1].sendall(b"stray")
+
+        a = pool.get()
+        self.assertEquals(3, len(self.peers))
+        self.assertTrue(a is not None)
+
+    def test_acquire(self):
+        pool = ConnectionPool(self.factory)
+        with pool.acquire() as a:
+            pass
+        self.assertTrue(pool.get() is a)
+        pool.put(a)
+
+        try:
+            with pool.acquire() as a:
+                raise ValueError
+        except ValueError:
+            pass
+        self.assertEquals(-1, a.fileno())
+
+    def test_create_connection(self):
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.addCleanup(server.close)
+        server.bind(("127.0.0.1", 0))
+        server.listen(1)
+
+        sock = create_connection(server.getsockname(), recv_buf=16384,
+                                 send_buf=32768)
+        self.addCleanup(sock.close)
+        self.assertTrue(sock.getsockopt(socket.SOL_SOCKET,
+                                        socket.SO_RCVBUF) >= 16384)
+        self.assertTrue(sock.getsockopt(socket.SOL_SOCKET,
+                                        socket.SO_SNDBUF) >= 32768)
+        self.assertTrue(sock.getsockopt(socket.IPPROTO_TCP,
+                                        socket.TCP_NODELAY))
+
+    def test_connection_manager(self):
+        cm = ConnectionManager(lambda address: self.factory())
+        a = cm.acquire(("127.0.0.1", 8087))
+        cm.release(("127.0.0.1", 8087), a)
+        self.assertFalse(cm.acquire(("127.0.0.1", 8098)) is a)
+        self.assertTrue(cm.acquire(("127.0.0.1", 8087)) is a)
+
+        cm.release(("127.0.0.1", 8087), a)
+        cm.close_all()
+        self.assertEquals(-1, a.fileno())
+
+    def test_connection_manager_give_back_after_close_all(self):
+        address = ("127.0.0.1", 8087)
+        cm = ConnectionManager(lambda address: self.factory(), minconn=2,
+                               maxconn=2)
+        a = cm.acquire(address)
+        b = cm.acquire(address)
+        cm.close_all()
+
+        # Neither of them goes into (or makes) a new pool.
+        cm.release(address, a)
+        cm.discard(address, b)
+        self.assertEquals(-1, a.fileno())
+        self.assertEquals(-1, b.fileno())
+        self.assertEquals(2, len(self.peers))
+
+        c = cm.acquire(address)
+        d = cm.acquire(address)
+        self.assertEquals(4, len(self.peers))
+        self.assertEquals(0, len(cm.pool(address)._idle))
+        cm.discard(address, c)
+        cm.discard(address, d)
+
+    def test_minconn_failure_closes_opened(self):
+        opened = []
+        def factory():
+            if len(opened) == 2:
+                raise socket.error("refused")
+            opened.append(self.factory())
+            return opened[-1]
+
+        self.assertRaises(socket.error, ConnectionPool, factory, minconn=3)
+        self.assertEquals([-1, -1], [conn.fileno() for conn in opened])
+
+class ResultTests(unittest.TestCase):
+    def test_mapping(self):
+        r = PutResult(status="ok", headers={})
+        r.key = "test_key"
+        self.assertEquals("test_key", r["key"])
+        self.assertEquals("test_key", r.key)
+        self.assertTrue("key" in r)
+        self.assertFalse("siblings" in r)
+        self.assertEquals(None, r.get("siblings"))
+        self.assertRaises(KeyError, lambda: r["siblings"])
+        self.assertEquals({"status": "ok", "headers": {}, "key": "test_key"},
+                          dict(r))
+
+class IndexKeysStreamTests(unittest.TestCase):
+    class FakeResponse(object):
+        def __init__(self, content, chunk_size):
+            self.content = content
+            self.chunk_size = chunk_size
+            self.closed = False
+
+        def iter_content(self, chunk_size):
+            for i in range(0, len(self.content), self.chunk_size):
+                yield self.content[i:i + self.chunk_size]
+
+        def close(self):
+            self.closed = True
+
+    def test_split_across_chunks(self):
+        keys = ["a", 'quo"te', u"\u00fcnicode", "x" * 40, ""]
+        content = json.dumps({"keys": keys}).encode("utf-8")
+        # Every size cuts the keys, the escapes and the multibyte
+        # characters somewhere else.
+        for chunk_size in range(1, len(content) + 1):
+            response = self.FakeResponse(content, chunk_size)
+            self.assertEquals(keys, list(_iter_index_keys(response)))
+            self.assertTrue(response.closed)
+
+    def test_empty(self):
+        response = self.FakeResponse(b'{"keys": []}', 3)
+        self.assertEquals([], list(_iter_index_keys(response)))
+
+    def test_truncated(self):
+        response = self.FakeResponse(b'{"keys": ["a", "b', 4)
+        self.assertRaises(RiakngError, list, _iter_index_keys(response))
+        self.assertTrue(response.closed)
+
 if __name__ == "__main__":
     unittest.main(verbosity=2)
-    clean_up_bucket_keys(bucket_key_cleanups)
 